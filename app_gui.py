@@ -8,7 +8,7 @@ from tkinter import filedialog, messagebox, ttk, simpledialog
 # Note: Removed unused 'get_image_files' import from utils, as selection is direct
 from photo_processor import extract_metadata_from_photos, cleanup_temp_files as cleanup_photo_temp_files # Explicit cleanup import
 from document_generator import create_document
-# map_generator cleanup is handled within document_generator now
+# map_generator renders maps/compasses in memory, so there is nothing of its to clean up
 
 class PhotoAppendixApp:
     def __init__(self, master):
@@ -9,11 +9,28 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
 from docx.enum.table import WD_ALIGN_VERTICAL # For vertical alignment in cells
 
 # Import cleanup functions with specific names to avoid confusion
-from photo_processor import cleanup_temp_files as cleanup_photo_temp_files
-from map_generator import generate_map_image, generate_compass_indicator, cleanup_temp_files as cleanup_map_temp_files
+from photo_processor import get_embeddable_image, cleanup_temp_files as cleanup_photo_temp_files
+from map_generator import generate_all
 
 # Removed the problematic set_cell_margins function
 
+# Map and compass images are generated at the resolution they are displayed at
+# (~100 DPI), so no pixels are drawn only to be scaled away by Word.
+MAP_IMAGE_SIZE = (180, 180)
+MAP_DISPLAY_WIDTH = Inches(1.75)
+COMPASS_IMAGE_SIZE = (100, 100)
+COMPASS_DISPLAY_WIDTH = Inches(1.0)
+
+def _future_result(future, label):
+    """Wait for a map/compass future and return its PNG stream, or None if it failed."""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"    ERROR: {label} generation worker failed: {type(e).__name__}: {e}")
+        return None
+
 def create_document(photo_data_list, output_path, images_per_page=2, include_location=True):
     """
     Create a Word document with photos, captions, location maps, and compass indicators.
@@ -32,8 +49,6 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
     print(f"Images per page: {images_per_page}")
     print(f"Include Location Info: {include_location}")
 
-    temp_map_compass_files = [] # Keep track of map/compass files created *during this run*
-
     try:
         # Create a new document
         doc = Document()
@@ -74,6 +89,15 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
         p_intro.paragraph_format.space_after = Pt(18) # Add space after intro
 
 
+        # --- Start Map/Compass Generation ---
+        # Maps and compasses are independent per photo, so submit them all up front
+        # to the worker pool and collect each result when its photo is reached.
+        location_futures = []
+        if include_location:
+            tasks = [(p.get('latitude'), p.get('longitude'), p.get('orientation')) for p in photo_data_list]
+            print(f"Submitting map/compass generation for {len(tasks)} photo(s) to worker pool...")
+            location_futures = generate_all(tasks, zoom=15, map_size=MAP_IMAGE_SIZE, compass_size=COMPASS_IMAGE_SIZE)
+
         # --- Photo Entries ---
         total_photos = len(photo_data_list)
         for i, photo_data in enumerate(photo_data_list):
@@ -137,10 +161,11 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                      #      img_height = max_height
                      #      img_width = img_height / aspect_ratio
 
+                image = get_embeddable_image(photo_data) # HEIC is converted to JPEG here
                 if img_height is not None and img_height > 0:
-                     img_run.add_picture(image_path, width=img_width, height=img_height)
+                     img_run.add_picture(image, width=img_width, height=img_height)
                 else:
-                     img_run.add_picture(image_path, width=img_width) # Let Word determine height
+                     img_run.add_picture(image, width=img_width) # Let Word determine height
 
                 # Reduce space after image paragraph if needed
                 img_paragraph.paragraph_format.space_after = Pt(2)
@@ -211,18 +236,12 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                     for para in map_coords_cell.paragraphs[1:]: # Remove extra default paragraphs if created somehow
                          map_coords_cell._element.remove(para._element)
 
-                    map_path = None
+                    map_image = None # In-memory PNG stream
                     if has_gps:
-                        print(f"    Generating map for Lat={photo_data['latitude']:.5f}, Lon={photo_data['longitude']:.5f}")
-                        map_path = generate_map_image(
-                            photo_data['latitude'],
-                            photo_data['longitude'],
-                            zoom=15,
-                            size=(180, 180) # Slightly larger map image size
-                        )
-                        if map_path:
-                            temp_map_compass_files.append(map_path)
-                            print(f"    Map generated: {map_path}")
+                        print(f"    Waiting for map for Lat={photo_data['latitude']:.5f}, Lon={photo_data['longitude']:.5f}")
+                        map_image = _future_result(location_futures[i][0], "Map")
+                        if map_image:
+                            print("    Map generated.")
                         else:
                             print("    Map generation failed.")
 
@@ -233,14 +252,12 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                     map_para.paragraph_format.space_before = Pt(3)
                     map_para.paragraph_format.space_after = Pt(2) # Small space after map
 
-                    if map_path:
+                    if map_image:
                         try:
                             map_run = map_para.add_run()
-                             # Adjust display size in document (e.g., 1.75 inches wide)
-                            map_display_width = Inches(1.75)
-                            map_run.add_picture(map_path, width=map_display_width)
+                            map_run.add_picture(map_image, width=MAP_DISPLAY_WIDTH)
                         except Exception as e:
-                            print(f"    ERROR: Could not add map image {map_path} to document: {e}")
+                            print(f"    ERROR: Could not add map image to document: {e}")
                             # Add error text in a new paragraph if map failed
                             err_p = map_coords_cell.add_paragraph("(Map Error)")
                             err_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -258,7 +275,7 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                          # Add spacing for padding effect
                          coords_para.paragraph_format.space_before = Pt(2)
                          coords_para.paragraph_format.space_after = Pt(3)
-                    elif not map_path: # No GPS and no map image was attempted/added
+                    elif not map_image: # No GPS and no map image was attempted/added
                          # Add placeholder text if the cell would otherwise be empty
                          no_gps_para = map_coords_cell.paragraphs[0] # Use first para if map wasn't added
                          no_gps_para.add_run("(No GPS Data)").italic = True
@@ -273,15 +290,14 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                     for para in compass_cell.paragraphs[1:]:
                          compass_cell._element.remove(para._element)
 
-                    compass_path = None
+                    compass_image = None # In-memory PNG stream
                     if has_orientation:
                          orientation = photo_data['orientation']
-                         print(f"    Generating compass for Orientation={orientation:.1f}°")
-                         compass_path = generate_compass_indicator(orientation, size=(100, 100)) # Keep compass size reasonable
+                         print(f"    Waiting for compass for Orientation={orientation:.1f}°")
+                         compass_image = _future_result(location_futures[i][1], "Compass")
 
-                         if compass_path:
-                              temp_map_compass_files.append(compass_path)
-                              print(f"    Compass generated: {compass_path}")
+                         if compass_image:
+                              print("    Compass generated.")
                          else:
                               print("    Compass generation failed.")
 
@@ -293,14 +309,12 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
                     compass_para.paragraph_format.space_before = Pt(3)
                     compass_para.paragraph_format.space_after = Pt(3)
 
-                    if compass_path:
+                    if compass_image:
                         try:
                              comp_run = compass_para.add_run()
-                             # Adjust display size (e.g., 1 inch wide)
-                             comp_display_width = Inches(1.0)
-                             comp_run.add_picture(compass_path, width=comp_display_width)
+                             comp_run.add_picture(compass_image, width=COMPASS_DISPLAY_WIDTH)
                         except Exception as e:
-                             print(f"    ERROR: Could not add compass image {compass_path} to document: {e}")
+                             print(f"    ERROR: Could not add compass image to document: {e}")
                              err_p = compass_cell.add_paragraph("(Compass Error)")
                              err_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
                     elif has_orientation: # Orientation existed, but compass failed
@@ -359,7 +373,5 @@ def create_document(photo_data_list, output_path, images_per_page=2, include_loc
         print("\nPerforming final cleanup...")
         # Cleanup temporary files created by photo_processor (e.g., HEIC conversions)
         cleanup_photo_temp_files(photo_data_list)
-        # Cleanup temporary files created by map_generator (maps, compasses)
-        cleanup_map_temp_files(temp_map_compass_files) # Pass the list of files created in *this run*
         print("Cleanup finished.")
         print("--- Document Generation Process Ended ---")
\ No newline at end of file
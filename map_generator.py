@@ -3,15 +3,25 @@ Photo Appendix Generator - Map and Direction Generation Module
 This module handles generating static map images and compass indicators.
 """
 import os
+import io
 import tempfile
 import math
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 from PIL import Image, ImageDraw, ImageFont
 import warnings
+from functools import lru_cache
 import requests # Import requests to potentially set User-Agent if needed later
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the staticmap library
 try:
     from staticmap import StaticMap, CircleMarker, Line # Import Line if needed later
+    # Tile projection, used to prefetch tiles and key maps by pixel
+    from staticmap.staticmap import _lon_to_x, _lat_to_y, _x_to_lon, _y_to_lat
     STATICMAP_AVAILABLE = True
     print("staticmap library found. Map generation enabled.")
 except ImportError:
@@ -22,11 +32,241 @@ except ImportError:
     print("---------------\n")
     STATICMAP_AVAILABLE = False
 
+# Standard OSM tile server WITHOUT subdomain placeholder
+OSM_TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+# A User-Agent header is required by the OSM tile usage policy
+OSM_HEADERS = {'User-Agent': 'PhotoAppendixGenerator/1.0 (Python StaticMap Script; contact: jordantbeaumont@gmail.com)'} # REPLACE EMAIL
+TILE_SIZE = 256
+TILE_REQUEST_TIMEOUT = 25 # Seconds per attempt
+TILE_MAX_RETRIES = 3
+# Worth retrying: rate limiting, server overload and gateway errors. Anything
+# else (e.g. 400/404) will fail the same way again.
+_TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# One pooled session for all tile downloads, so requests to the tile server
+# reuse keep-alive connections instead of a new TCP/TLS handshake per tile.
+# Sized for the tile threads (StaticMap and prefetch_tiles() both use 4).
+_TILE_SESSION = requests.Session()
+_TILE_SESSION.headers.update(OSM_HEADERS)
+_TILE_SESSION.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# The OSM tile usage policy allows at most 2 concurrent downloads, however many
+# threads want tiles. When the server asks us to back off (429/503 with
+# Retry-After), every thread waits until _tile_backoff_until, not just the one
+# that got the response.
+TILE_MAX_CONCURRENT_REQUESTS = 2
+_tile_request_slots = threading.BoundedSemaphore(TILE_MAX_CONCURRENT_REQUESTS)
+_tile_backoff_until = 0.0
+
+# Persistent on-disk caches, shared across runs. Photos from one worksite
+# reuse the same few tiles (and often the same spot), so most renders need no
+# network at all, and repeat runs need no rendering either.
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'photo_appendix')
+TILE_CACHE_DIR = os.path.join(CACHE_DIR, 'tiles')
+MAP_CACHE_DIR = os.path.join(CACHE_DIR, 'maps')
+TILE_CACHE_MAX_AGE = 30 * 24 * 60 * 60 # Seconds; OSM tiles change slowly
+CACHE_MAX_BYTES = 200 * 1024 * 1024 # Least recently used files are evicted above this
+
+
+def _is_cache_fresh(cache_path):
+    """True if the cache file exists and is not yet expired."""
+    try:
+        return time.time() - os.path.getmtime(cache_path) <= TILE_CACHE_MAX_AGE
+    except OSError:
+        return False
+
+
+def _read_cache_file(cache_path):
+    """Return the bytes of a fresh cache file, or None if missing or expired."""
+    if not _is_cache_fresh(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_cache_file(cache_path, content):
+    """Store bytes in a cache file. Written atomically, so concurrent readers never see partial files."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.part')
+        with os.fdopen(temp_fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"    Warning: Could not write cache file '{cache_path}': {e}")
+
+
+def _tile_cache_path(url):
+    """Map a tile URL to its cache file, e.g. <cache>/tile.openstreetmap.org/15/x/y.png."""
+    parts = urlsplit(url)
+    return os.path.join(TILE_CACHE_DIR, parts.netloc, *parts.path.strip('/').split('/'))
+
+
+def _is_tile_cached(url):
+    """True if the tile is in the cache and not yet expired."""
+    return _is_cache_fresh(_tile_cache_path(url))
+
+
+def _read_cached_tile(url):
+    """Return cached tile bytes for a URL, or None if missing or expired."""
+    return _read_cache_file(_tile_cache_path(url))
+
+
+def _write_cached_tile(url, content):
+    """Store tile bytes in the tile cache."""
+    _write_cache_file(_tile_cache_path(url), content)
+
+
+def _prune_cache(keep_paths=(), max_bytes=CACHE_MAX_BYTES):
+    """
+    Evict least recently used tile/map cache files once the cache exceeds max_bytes.
+
+    Evicts down to 80% of the limit so the scan doesn't rerun on every new
+    tile. Files in keep_paths (those the current batch needs) are never evicted.
+
+    Returns:
+        int: Number of files removed.
+    """
+    entries = []
+    total_bytes = 0
+    # Only the tile and map caches; CACHE_DIR also holds other modules' files (e.g. metadata.json)
+    for cache_dir in (TILE_CACHE_DIR, MAP_CACHE_DIR):
+        for dir_path, _, file_names in os.walk(cache_dir):
+            for file_name in file_names:
+                if file_name.endswith('.part'):
+                    continue # Another thread's write in progress
+                path = os.path.join(dir_path, file_name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                total_bytes += st.st_size
+                # atime may not be updated (noatime mounts); a write still counts as use
+                entries.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+    if total_bytes <= max_bytes:
+        return 0
+
+    keep_paths = set(keep_paths)
+    target_bytes = int(max_bytes * 0.8)
+    removed = 0
+    for _, file_size, path in sorted(entries):
+        if total_bytes <= target_bytes:
+            break
+        if path in keep_paths:
+            continue
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total_bytes -= file_size
+        removed += 1
+    print(f"Pruned {removed} old file(s) from the map cache.")
+    return removed
+
+
+def _map_key(latitude, longitude, zoom):
+    """
+    Key a map by the global pixel its centre falls on at this zoom.
+
+    StaticMap centres each map on its marker, so every point within one
+    pixel renders the same map once snapped to it (see _map_key_coords()).
+    This is the coarsest grid that never visibly moves the marker.
+
+    Returns:
+        tuple: (zoom, pixel_x, pixel_y), or None if the coordinates can't be mapped.
+    """
+    if not STATICMAP_AVAILABLE or latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    try:
+        return (zoom, round(_lon_to_x(longitude, zoom) * TILE_SIZE), round(_lat_to_y(latitude, zoom) * TILE_SIZE))
+    except (ValueError, ZeroDivisionError): # The poles themselves have no Mercator y
+        return None
+
+
+def _map_key_coords(map_key):
+    """(latitude, longitude) of the pixel centre a map key stands for."""
+    zoom, pixel_x, pixel_y = map_key
+    return _y_to_lat(pixel_y / TILE_SIZE, zoom), _x_to_lon(pixel_x / TILE_SIZE, zoom)
+
+
+def _map_cache_path(map_key, size):
+    """Cache file for a rendered map, named by its pixel key."""
+    zoom, pixel_x, pixel_y = map_key
+    return os.path.join(MAP_CACHE_DIR, f"{zoom}_{size[0]}x{size[1]}_{pixel_x}_{pixel_y}.png")
+
+
+if STATICMAP_AVAILABLE:
+    class CachedStaticMap(StaticMap):
+        """StaticMap that fetches tiles through the on-disk tile cache and reuses marker layers."""
+
+        def get(self, url, **kwargs):
+            content = _read_cached_tile(url)
+            if content is not None:
+                return 200, content
+            # Single attempt: StaticMap retries failed tiles itself, and
+            # prefetch_tiles() has already done the backoff retries
+            return _download_tile(url, headers=kwargs.get('headers'), timeout=kwargs.get('timeout'),
+                                  max_attempts=1)
+
+        def _draw_features(self, image):
+            # Markers are drawn on a supersampled layer that is then resized,
+            # which costs as much as compositing the tiles. Each map is centred
+            # on its marker, so the layer is identical for every map of a size;
+            # reuse it. Anything other than circle markers takes the normal path.
+            if self.lines or self.polygons or not all(isinstance(m, CircleMarker) for m in self.markers):
+                return super()._draw_features(image)
+            circles = tuple((self._x_to_px(_lon_to_x(m.coord[0], self.zoom)),
+                             self._y_to_px(_lat_to_y(m.coord[1], self.zoom)), m.width, m.color)
+                            for m in self.markers)
+            layer = _marker_layer((self.width, self.height), circles)
+            image.paste(layer, (0, 0), layer)
+
+
+@lru_cache(maxsize=16)
+def _marker_layer(size, circles):
+    """
+    Draw circle markers the way StaticMap does, cached per size and marker set.
+
+    Args:
+        size (tuple): Map size (width, height) in pixels.
+        circles (tuple): One (pixel_x, pixel_y, width, color) entry per marker.
+
+    Returns:
+        PIL.Image.Image: RGBA layer to paste over the map with itself as mask.
+    """
+    # Drawn at twice the size and downsampled for antialiasing, as in StaticMap
+    layer = Image.new('RGBA', (size[0] * 2, size[1] * 2), (255, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    for pixel_x, pixel_y, width, color in circles:
+        point = (pixel_x * 2, pixel_y * 2)
+        draw.ellipse((point[0] - width, point[1] - width, point[0] + width, point[1] + width), fill=color)
+    return layer.resize(size, Image.LANCZOS)
+
+# zlib level for the temp PNGs. They are small and short-lived, so the fastest
+# level costs only a few percent in size versus the default of 6.
+PNG_COMPRESS_LEVEL = 1
+
+# The compass is a few flat colors plus their antialiased edges (~300 colors
+# in all), so an adaptive 256-color palette is visually lossless and the PNG
+# is about a third smaller than 24-bit RGB.
+COMPASS_PALETTE_COLORS = 256
+
 # Keep track of temporary files created *by this module* in a single run
 _temp_files_this_run = []
 
-def find_font(preferred_fonts=["Veranda", "Arial", "DejaVuSans", "Helvetica"], size=10):
-     """Tries to find a suitable TTF font."""
+@lru_cache(maxsize=8)
+def _find_font_file(preferred_fonts):
+     """
+     Resolve the first available font in preferred_fonts to a file Pillow can load.
+
+     Cached per font list, so the font directories are probed once however
+     many sizes are loaded. Returns None if none of the fonts are found.
+     """
      font_paths = [
          '/usr/share/fonts/truetype/dejavu/', # Linux DejaVu
          '/usr/share/fonts/truetype/msttcorefonts/', # Linux MS Core Fonts
@@ -36,16 +276,41 @@ def find_font(preferred_fonts=["Veranda", "Arial", "DejaVuSans", "Helvetica"], s
      ]
      for font_name in preferred_fonts:
          try:
-             found_font = ImageFont.truetype(f"{font_name}.ttf", size)
-             return found_font
+             # Pillow searches the system font directories itself for bare names.
+             # Return the file it found, so later sizes don't repeat that search.
+             return ImageFont.truetype(f"{font_name}.ttf").path
          except IOError: pass
          for path_dir in font_paths:
-             try:
-                 font_file = os.path.join(path_dir, f"{font_name}.ttf")
-                 if os.path.exists(font_file):
-                     found_font = ImageFont.truetype(font_file, size)
-                     return found_font
-             except Exception: continue
+             font_file = os.path.join(path_dir, f"{font_name}.ttf")
+             if os.path.exists(font_file):
+                 return font_file
+     return None
+
+
+def find_font(preferred_fonts=("Veranda", "Arial", "DejaVuSans", "Helvetica"), size=10):
+     """
+     Tries to find a suitable TTF font.
+
+     preferred_fonts may be any sequence of font names. Repeat lookups reuse
+     the font loaded by _load_font() instead of parsing the TTF again.
+     """
+     return _load_font(tuple(preferred_fonts), size)
+
+
+@lru_cache(maxsize=8)
+def _load_font(preferred_fonts, size):
+     """
+     Load the first available font in preferred_fonts (a tuple) at size.
+
+     Cached per (preferred_fonts, size). The file itself is resolved once per
+     font list by _find_font_file().
+     """
+     font_file = _find_font_file(preferred_fonts)
+     if font_file is not None:
+         try:
+             return ImageFont.truetype(font_file, size)
+         except Exception as e:
+             print(f"Warning: Could not load font '{font_file}': {e}")
      print(f"Warning: Could not find preferred fonts ({preferred_fonts}). Using default Pillow font.")
      try:
          font = ImageFont.load_default()
@@ -54,15 +319,187 @@ def find_font(preferred_fonts=["Veranda", "Arial", "DejaVuSans", "Helvetica"], s
          print(f"FATAL: Could not load default Pillow font: {e}")
          raise RuntimeError("Unable to load any fonts for image generation.")
 
+# The compass is drawn at this multiple of its output size and downsampled,
+# which antialiases the circle, ticks and arrow (StaticMap does the same for
+# its markers). Fonts are loaded at the matching size.
+COMPASS_SUPERSAMPLE = 2
+_COMPASS_FONT_LABELS = find_font(size=11 * COMPASS_SUPERSAMPLE)
+_COMPASS_FONT_TEXT = find_font(size=10 * COMPASS_SUPERSAMPLE)
+
+# Compass colors
+_COMPASS_BACKGROUND = (255, 255, 255) # White
+_COMPASS_OUTLINE = (100, 100, 100) # Gray outer circle
+_COMPASS_TEXT = (0, 0, 0) # Black labels and degree text
+_COMPASS_TICK_MAJOR = (0, 0, 0) # Black
+_COMPASS_TICK_MID = (50, 50, 50) # Dark Gray
+_COMPASS_TICK_MINOR = (150, 150, 150) # Light Gray
+_COMPASS_ARROW = (200, 0, 0) # Red
+_COMPASS_HUB_FILL = (255, 255, 255)
+_COMPASS_HUB_OUTLINE = (50, 50, 50)
+_MAP_MARKER_COLOR = 'red'
+_MAP_MARKER_SIZE = 12
+
+# Angle of the compass arrowhead sides, fixed for every heading
+_HEAD_ANGLE = math.radians(25)
+_HEAD_COS, _HEAD_SIN = math.cos(_HEAD_ANGLE), math.sin(_HEAD_ANGLE)
+
+# (sin, cos) of every whole-degree heading; compass headings are rounded to
+# whole degrees (see _valid_orientation()), so no heading needs its own trig
+_HEADING_SIN_COS = tuple((math.sin(math.radians(degrees)), math.cos(math.radians(degrees)))
+                         for degrees in range(360))
+
+def _scaled(value, scale):
+    """Scale a pixel measurement designed for the 100px compass, keeping it at least 1px."""
+    return max(1, int(round(value * scale)))
+
+@lru_cache(maxsize=8)
+def _compass_ticks(size):
+    """
+    Compute the compass tick marks for an image size, cached per size.
 
-DEFAULT_FONT_SMALL = find_font(size=9)
-DEFAULT_FONT_NORMAL = find_font(size=10)
-DEFAULT_FONT_COMPASS = find_font(size=11)
+    The ticks never change for a given size, so the trig and list building
+    happen once instead of on every compass.
 
+    Returns:
+        tuple: One (segment, color, width) entry per tick, where segment is
+               [(start_x, start_y), (end_x, end_y)].
+    """
+    center_x, center_y = size[0] // 2, size[1] // 2
+    scale = min(size) / 100.0
+    radius = min(center_x, center_y) - _scaled(15, scale)
+
+    ticks = []
+    for angle in range(0, 360, 15): # Ticks every 15 degrees
+        angle_rad = math.radians(angle)
+        is_major_cardinal = (angle % 90 == 0)
+        is_minor_cardinal = (angle % 45 == 0) and not is_major_cardinal
+
+        if is_major_cardinal:
+            tick_len = _scaled(6, scale)
+            tick_width = _scaled(2, scale)
+            color = _COMPASS_TICK_MAJOR
+        elif is_minor_cardinal:
+            tick_len = _scaled(4, scale)
+            tick_width = _scaled(1, scale)
+            color = _COMPASS_TICK_MID
+        else: # Minor ticks
+            tick_len = _scaled(2, scale)
+            tick_width = _scaled(1, scale)
+            color = _COMPASS_TICK_MINOR
+
+        inner_r = radius - tick_len
+        outer_r = radius
+        start_x = center_x + inner_r * math.sin(angle_rad)
+        start_y = center_y - inner_r * math.cos(angle_rad)
+        end_x = center_x + outer_r * math.sin(angle_rad)
+        end_y = center_y - outer_r * math.cos(angle_rad)
+        ticks.append(([(start_x, start_y), (end_x, end_y)], color, tick_width))
+    return tuple(ticks)
+
+@lru_cache(maxsize=8)
+def _compass_labels(size, font):
+    """
+    Compute the top-left text positions of the N/E/S/W labels, cached per (size, font).
 
-def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
+    Returns:
+        tuple: One (label, (x, y)) entry per cardinal direction.
+    """
+    center_x, center_y = size[0] // 2, size[1] // 2
+    scale = min(size) / 100.0
+    radius = min(center_x, center_y) - _scaled(15, scale)
+    label_dist = radius + _scaled(8, scale) # Position labels just outside the circle
+
+    labels = []
+    for dir_label, angle in [("N", 0), ("E", 90), ("S", 180), ("W", 270)]:
+        angle_rad = math.radians(angle)
+        label_x = center_x + label_dist * math.sin(angle_rad)
+        label_y = center_y - label_dist * math.cos(angle_rad)
+        text_width, text_height = _measure_text(dir_label, font)
+        labels.append((dir_label, (label_x - text_width/2, label_y - text_height/2)))
+    return tuple(labels)
+
+@lru_cache(maxsize=8)
+def _compass_base(size):
     """
-    Generate a static map image for the given coordinates using OpenStreetMap data.
+    Draw the static compass rose (outer circle, ticks, N/E/S/W labels), cached per size.
+
+    Callers must copy() the result before drawing on it.
+    """
+    # 24-bit RGB with white background. The compass is always placed on an
+    # opaque page, so an alpha channel only adds per-pixel work.
+    img = Image.new('RGB', size, _COMPASS_BACKGROUND)
+    draw = ImageDraw.Draw(img)
+
+    center_x, center_y = size[0] // 2, size[1] // 2
+    scale = min(size) / 100.0
+    radius = min(center_x, center_y) - _scaled(15, scale)
+
+    # Outer circle
+    draw.ellipse([(center_x - radius, center_y - radius),
+                  (center_x + radius, center_y + radius)],
+                 outline=_COMPASS_OUTLINE, width=_scaled(1, scale))
+
+    # Tick marks (major and minor)
+    for segment, color, tick_width in _compass_ticks(size):
+        draw.line(segment, fill=color, width=tick_width)
+
+    # Cardinal direction labels (N, E, S, W)
+    for dir_label, position in _compass_labels(size, _COMPASS_FONT_LABELS):
+        draw.text(position, dir_label, fill=_COMPASS_TEXT, font=_COMPASS_FONT_LABELS)
+    return img
+
+# Scratch canvas used only for measuring text
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+# Text measuring API differs across Pillow versions; check once instead of
+# catching AttributeError on every measurement
+_HAS_TEXTBBOX = hasattr(_MEASURE_DRAW, 'textbbox')
+_HAS_TEXTSIZE = hasattr(_MEASURE_DRAW, 'textsize')
+
+
+@lru_cache(maxsize=512)
+def _measure_text(text, font):
+    """
+    Measure the rendered size of a text string, cached per (text, font).
+
+    The compass labels and degree strings repeat across photos, so the
+    FreeType metrics walk only needs to happen once per string.
+
+    Returns:
+        tuple: (width, height) in pixels.
+    """
+    # Use textbbox for better centering if available (Pillow >= 8)
+    if _HAS_TEXTBBOX:
+        bbox = _MEASURE_DRAW.textbbox((0, 0), text, font=font)
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    # Fallback for older Pillow versions
+    if _HAS_TEXTSIZE:
+        return _MEASURE_DRAW.textsize(text, font=font)
+    # If both textbbox and textsize are missing, estimate size
+    print(f"Warning: Neither textbbox nor textsize found. Estimating text size for '{text}'.")
+    return len(text) * (font.size // 2), font.size # Crude estimate
+
+
+@lru_cache(maxsize=360)
+def _text_mask(text, font):
+    """
+    Rasterize a text string once into an 'L' mask, cached per (text, font).
+
+    Survey photos often share a heading to the whole degree, so the degree
+    label can be pasted from the cache instead of being rendered again.
+    """
+    if _HAS_TEXTBBOX:
+        # Right/bottom of the box drawn at (0, 0), so the mask includes the glyph offset
+        _, _, mask_width, mask_height = _MEASURE_DRAW.textbbox((0, 0), text, font=font)
+    else:
+        mask_width, mask_height = _measure_text(text, font)
+    mask = Image.new('L', (max(mask_width, 1), max(mask_height, 1)), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=font)
+    return mask
+
+
+def _render_map_image(latitude, longitude, zoom=15, size=(180, 180)):
+    """
+    Render a static map image for the given coordinates using OpenStreetMap data.
 
     Args:
         latitude (float): Latitude coordinate.
@@ -71,10 +508,8 @@ def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
         size (tuple): Size of the output image (width, height) in pixels.
 
     Returns:
-        str: Path to the generated map image (temporary file) or None if failed.
+        PIL.Image.Image: The rendered map, or None if failed.
     """
-    global _temp_files_this_run
-
     if not STATICMAP_AVAILABLE:
         print("Skipping map generation: 'staticmap' library not available.")
         return None
@@ -87,24 +522,20 @@ def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
         print(f"Skipping map generation: Invalid coordinates Lat={latitude}, Lon={longitude}")
         return None
 
-    temp_img_path = None
     try:
         width, height = size
         print(f"  Attempting map generation for Lat={latitude:.5f}, Lon={longitude:.5f} (Zoom={zoom}, Size={width}x{height})")
 
-        # ***** FIX: Changed the URL Template back to standard OSM tile server WITHOUT subdomain placeholder *****
-        osm_url = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
-        print(f"    Using tile server URL: {osm_url}")
+        print(f"    Using tile server URL: {OSM_TILE_URL}")
 
-        # Create StaticMap instance with the new URL
-        # We also add a basic User-Agent header - THIS IS IMPORTANT for OSM policy
-        headers = {'User-Agent': 'PhotoAppendixGenerator/1.0 (Python StaticMap Script; contact: jordantbeaumont@gmail.com)'} # REPLACE EMAIL
-        map_instance = StaticMap(width, height, url_template=osm_url, headers=headers)
+        # Create StaticMap instance; the User-Agent header is IMPORTANT for OSM policy
+        map_instance = CachedStaticMap(width, height, url_template=OSM_TILE_URL, tile_size=TILE_SIZE,
+                                       headers=OSM_HEADERS)
 
 
         # Add marker
         marker_coord = (longitude, latitude) # Longitude first
-        marker = CircleMarker(marker_coord, 'red', 12)
+        marker = CircleMarker(marker_coord, _MAP_MARKER_COLOR, _MAP_MARKER_SIZE)
         map_instance.add_marker(marker)
 
         # Render the map image object
@@ -112,23 +543,54 @@ def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
         image = map_instance.render(zoom=zoom)
         print("    Map rendered.")
 
+        return image
+
+    except Exception as e:
+        print(f"  ERROR generating map image for ({latitude:.5f}, {longitude:.5f}): {type(e).__name__}: {str(e)}")
+        # import traceback # Uncomment for detailed debugging if needed
+        # print("  --- Map Generation Traceback ---")
+        # traceback.print_exc()
+        # print("  --------------------------------")
+        return None
+
+
+def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
+    """
+    Generate a static map image for the given coordinates and save it to a temporary PNG.
+
+    Kept as public API for existing callers; the app itself uses generate_all(),
+    which returns in-memory PNGs. Remove the file with cleanup_temp_files().
+
+    Args:
+        latitude (float): Latitude coordinate.
+        longitude (float): Longitude coordinate.
+        zoom (int): Zoom level for the map (default: 15).
+        size (tuple): Size of the output image (width, height) in pixels.
+
+    Returns:
+        str: Path to the generated map image (temporary file) or None if failed.
+    """
+    global _temp_files_this_run
+
+    png_data = _map_png_data(latitude, longitude, zoom, size)
+    if png_data is None:
+        return None
+
+    temp_img_path = None
+    try:
         # Save to a temporary PNG file
         temp_fd, temp_img_path = tempfile.mkstemp(suffix='.png')
-        os.close(temp_fd)
         print(f"    Saving map to temporary file: {os.path.basename(temp_img_path)}")
-        image.save(temp_img_path, 'PNG')
+        # Write through mkstemp's descriptor rather than closing it and reopening by path
+        with os.fdopen(temp_fd, 'wb') as f:
+            f.write(png_data)
         print("    Map saved.")
 
         _temp_files_this_run.append(temp_img_path)
         return temp_img_path
 
     except Exception as e:
-        print(f"  ERROR generating map image for ({latitude:.5f}, {longitude:.5f}): {type(e).__name__}: {str(e)}")
-        # import traceback # Uncomment for detailed debugging if needed
-        # print("  --- Map Generation Traceback ---")
-        # traceback.print_exc()
-        # print("  --------------------------------")
-
+        print(f"  ERROR saving map image for ({latitude:.5f}, {longitude:.5f}): {type(e).__name__}: {str(e)}")
         if temp_img_path and os.path.exists(temp_img_path):
              try:
                  os.unlink(temp_img_path)
@@ -138,21 +600,54 @@ def generate_map_image(latitude, longitude, zoom=15, size=(180, 180)):
         return None
 
 
-# --- [ generate_compass_indicator and cleanup_temp_files remain the same as previous version ] ---
-# --- [ Make sure they are present in your file ] ---
-def generate_compass_indicator(orientation, size=(100, 100)):
+def generate_map_bytes(latitude, longitude, zoom=15, size=(180, 180)):
     """
-    Generate a compass direction indicator showing camera orientation heading.
+    Generate a static map image for the given coordinates as an in-memory PNG.
 
-    Args:
-        orientation (float): Direction in degrees (0-360, 0/360=North).
-        size (tuple): Size of the output image (width, height).
+    Same as generate_map_image(), but skips the temp file write and re-read for
+    callers that can take a stream (e.g. python-docx add_picture).
 
     Returns:
-        str: Path to the generated compass image (temporary file) or None if failed.
+        io.BytesIO: PNG data positioned at the start, or None if failed.
     """
-    global _temp_files_this_run
+    png_data = _map_png_data(latitude, longitude, zoom, size)
+    return io.BytesIO(png_data) if png_data is not None else None
+
+
+def _map_png_data(latitude, longitude, zoom, size):
+    """Return the map as PNG bytes, from the rendered-map cache if possible, else rendered and cached."""
+    map_key = _map_key(latitude, longitude, zoom)
+    if map_key is None:
+        # Not mappable; _render_map_image() reports why
+        image = _render_map_image(latitude, longitude, zoom, size)
+        return _png_stream(image).getvalue() if image is not None else None
+
+    cache_path = _map_cache_path(map_key, size)
+    png_data = _read_cache_file(cache_path)
+    if png_data is not None:
+        print(f"  Using cached map for Lat={latitude:.5f}, Lon={longitude:.5f}")
+        return png_data
+
+    # Render at the pixel centre, so every point sharing the key gets the same map
+    image = _render_map_image(*_map_key_coords(map_key), zoom, size)
+    if image is None:
+        return None
+    png_data = _png_stream(image).getvalue()
+    _write_cache_file(cache_path, png_data)
+    return png_data
+
+
+def _valid_orientation(orientation):
+    """
+    Validate a compass heading and round it to whole degrees.
+
+    The degree label already shows whole degrees, and half a degree moves the
+    arrow tip by well under a pixel. Rounding keeps the arrow consistent with
+    the label and lets photos with the same heading share one compass image.
 
+    Returns:
+        float: The heading to draw, or None if missing or invalid.
+    """
     if orientation is None:
         # print("Skipping compass generation: Orientation data is missing.") # Reduced verbosity
         return None
@@ -165,144 +660,94 @@ def generate_compass_indicator(orientation, size=(100, 100)):
               orientation = 0
          else:
               return None
+    return float(round(orientation))
 
 
-    temp_img_path = None # Initialize path
+def _render_compass(orientation, size=(100, 100)):
+    """
+    Render a compass direction indicator for an already validated heading.
+
+    Args:
+        orientation (float): Direction in degrees, as returned by _valid_orientation().
+        size (tuple): Size of the output image (width, height).
+
+    Returns:
+        PIL.Image.Image: The rendered compass as a palette ("P") image, or None if failed.
+    """
     try:
-        # Create a new image with white background, use RGBA for potential transparency later
-        img = Image.new('RGBA', size, (255, 255, 255, 255)) # White background
+        # Start from a copy of the static rose; only the heading-dependent parts are drawn here.
+        # Drawn supersampled and downsampled before saving, for antialiased edges.
+        render_size = (size[0] * COMPASS_SUPERSAMPLE, size[1] * COMPASS_SUPERSAMPLE)
+        img = _compass_base(render_size).copy()
         draw = ImageDraw.Draw(img)
 
         # Center and Radius
-        center_x, center_y = size[0] // 2, size[1] // 2
-        margin = 15 # Margin for labels and text
+        center_x, center_y = render_size[0] // 2, render_size[1] // 2
+        # Geometry below is designed for a 100px compass; scale it so callers can
+        # render directly at the size the image will be displayed at.
+        scale = min(render_size) / 100.0
+        margin = _scaled(15, scale) # Margin for labels and text
         radius = min(center_x, center_y) - margin
 
-        # --- Draw Compass Rose ---
-        # Outer circle
-        draw.ellipse([(center_x - radius, center_y - radius),
-                      (center_x + radius, center_y + radius)],
-                     outline=(100, 100, 100), width=1) # Gray outline
-
-        # Tick marks (major and minor)
-        for angle in range(0, 360, 15): # Ticks every 15 degrees
-            angle_rad = math.radians(angle)
-            is_major_cardinal = (angle % 90 == 0)
-            is_minor_cardinal = (angle % 45 == 0) and not is_major_cardinal
-
-            if is_major_cardinal:
-                tick_len = 6
-                tick_width = 2
-                color = (0, 0, 0) # Black
-            elif is_minor_cardinal:
-                 tick_len = 4
-                 tick_width = 1
-                 color = (50, 50, 50) # Dark Gray
-            else: # Minor ticks
-                tick_len = 2
-                tick_width = 1
-                color = (150, 150, 150) # Light Gray
-
-            inner_r = radius - tick_len
-            outer_r = radius
-            start_x = center_x + inner_r * math.sin(angle_rad)
-            start_y = center_y - inner_r * math.cos(angle_rad)
-            end_x = center_x + outer_r * math.sin(angle_rad)
-            end_y = center_y - outer_r * math.cos(angle_rad)
-            draw.line([(start_x, start_y), (end_x, end_y)], fill=color, width=tick_width)
-
-
-        # Cardinal direction labels (N, E, S, W)
-        font_labels = DEFAULT_FONT_COMPASS
-        for dir_label, angle in [("N", 0), ("E", 90), ("S", 180), ("W", 270)]:
-            angle_rad = math.radians(angle)
-            label_dist = radius + 8 # Position labels just outside the circle
-            label_x = center_x + label_dist * math.sin(angle_rad)
-            label_y = center_y - label_dist * math.cos(angle_rad)
-
-            # Use textbbox for better centering if available (Pillow >= 8)
-            try:
-                 bbox = draw.textbbox((0, 0), dir_label, font=font_labels)
-                 text_width = bbox[2] - bbox[0]
-                 text_height = bbox[3] - bbox[1]
-            except AttributeError:
-                 text_width, text_height = draw.textsize(dir_label, font=font_labels) # Fallback
-
-            draw.text((label_x - text_width/2, label_y - text_height/2),
-                     dir_label, fill=(0, 0, 0), font=font_labels)
-
 
         # --- Draw Orientation Arrow ---
-        orientation_rad = math.radians(orientation)
-        arrow_length = radius - 3 # Arrow stops just inside the circle
-        arrow_color = (200, 0, 0, 255) # Opaque Red
-        arrow_width = 2
+        sin_o, cos_o = _HEADING_SIN_COS[int(orientation) % 360]
+        arrow_length = radius - _scaled(3, scale) # Arrow stops just inside the circle
+        arrow_color = _COMPASS_ARROW
+        arrow_width = _scaled(2, scale)
 
         # Calculate arrow end point
-        end_x = center_x + arrow_length * math.sin(orientation_rad)
-        end_y = center_y - arrow_length * math.cos(orientation_rad)
+        end_x = center_x + arrow_length * sin_o
+        end_y = center_y - arrow_length * cos_o
 
         # Draw arrow line
         draw.line([(center_x, center_y), (end_x, end_y)], fill=arrow_color, width=arrow_width)
 
         # Draw arrow head (as a filled triangle)
-        head_size = 8 # Size of the arrowhead base/height
-        head_angle = math.radians(25) # Angle of the arrowhead sides
-
-        # Points for the arrowhead polygon (relative to the arrow end point)
-        angle1 = orientation_rad + math.pi - head_angle # Point 1 angle
-        angle2 = orientation_rad + math.pi + head_angle # Point 2 angle
+        head_size = _scaled(8, scale) # Size of the arrowhead base/height
 
-        head1_x = end_x + head_size * math.sin(angle1)
-        head1_y = end_y - head_size * math.cos(angle1)
-        head2_x = end_x + head_size * math.sin(angle2)
-        head2_y = end_y - head_size * math.cos(angle2)
+        # Points for the arrowhead polygon (relative to the arrow end point).
+        # The sides point back along orientation + 180° -/+ the head angle; the
+        # angle-addition identities reuse sin_o/cos_o instead of new trig calls.
+        head1_x = end_x + head_size * (cos_o * _HEAD_SIN - sin_o * _HEAD_COS)
+        head1_y = end_y + head_size * (cos_o * _HEAD_COS + sin_o * _HEAD_SIN)
+        head2_x = end_x - head_size * (sin_o * _HEAD_COS + cos_o * _HEAD_SIN)
+        head2_y = end_y + head_size * (cos_o * _HEAD_COS - sin_o * _HEAD_SIN)
 
         # Draw filled polygon for arrowhead
         draw.polygon([(end_x, end_y), (head1_x, head1_y), (head2_x, head2_y)], fill=arrow_color)
 
 
         # --- Draw Central Hub ---
-        hub_radius = 3
+        hub_radius = _scaled(3, scale)
         draw.ellipse([(center_x - hub_radius, center_y - hub_radius),
                       (center_x + hub_radius, center_y + hub_radius)],
-                     fill=(255, 255, 255), outline=(50, 50, 50), width=1)
+                     fill=_COMPASS_HUB_FILL, outline=_COMPASS_HUB_OUTLINE, width=_scaled(1, scale))
 
 
         # --- Add Orientation Text ---
-        font_text = DEFAULT_FONT_NORMAL
+        font_text = _COMPASS_FONT_TEXT
         orientation_text = f"{orientation:.0f}°" # Show whole degrees
         
         # Calculate text position inside the circle near the tail of the arrow
         # We'll position it slightly behind the center point, opposite to the arrow's direction
-        text_offset_distance = 15 # Distance from the center to position the text
-        text_angle_rad = orientation_rad + math.pi # Opposite direction of the arrow
+        text_offset_distance = _scaled(15, scale) # Distance from the center to position the text
 
-        text_x_pos = center_x + text_offset_distance * math.sin(text_angle_rad)
-        text_y_pos = center_y - text_offset_distance * math.cos(text_angle_rad)
+        # Opposite direction of the arrow: sin/cos of (orientation + 180°)
+        text_x_pos = center_x - text_offset_distance * sin_o
+        text_y_pos = center_y + text_offset_distance * cos_o
 
 
-         # Calculate text width and height for centering
-        try:
-             bbox = draw.textbbox((0, 0), orientation_text, font=font_text)
-             text_width = bbox[2] - bbox[0]
-             text_height = bbox[3] - bbox[1]
-        except AttributeError:
-            # Fallback for older Pillow versions
-            try:
-                text_width, _ = draw.textsize(orientation_text, font=font_text)
-            except AttributeError:
-                 # If both textbbox and textsize are missing, estimate size
-                 text_width = len(orientation_text) * (font_text.size // 2) # Crude estimate
-                 print(f"Warning: Neither textbbox nor textsize found. Estimating text size for '{orientation_text}'.")
+        # Calculate text width and height for centering
+        text_width, text_height = _measure_text(orientation_text, font_text)
 
         # Adjust position to center the text
         final_text_x = text_x_pos - text_width/2
         final_text_y = text_y_pos - text_height/2
 
 
-        draw.text((final_text_x, final_text_y),
-                  orientation_text, fill=(0, 0, 0), font=font_text)
+        img.paste(_COMPASS_TEXT, (int(round(final_text_x)), int(round(final_text_y))),
+                  _text_mask(orientation_text, font_text))
         # below commented out section is the previous version position of the text
         # Calculate text position below the compass
         #try:
@@ -316,10 +761,45 @@ def generate_compass_indicator(orientation, size=(100, 100)):
         #          orientation_text, fill=(0, 0, 0), font=font_text)
 
 
+        # Downsample to the output size; LANCZOS averages the supersampled edges
+        img = img.resize(size, Image.LANCZOS)
+        return img.convert('P', palette=Image.ADAPTIVE, colors=COMPASS_PALETTE_COLORS)
+
+    except Exception as e:
+        print(f"ERROR generating compass indicator for {orientation}°: {str(e)}")
+        return None
+
+
+def generate_compass_indicator(orientation, size=(100, 100)):
+    """
+    Generate a compass direction indicator showing camera orientation heading.
+
+    Kept as public API for existing callers; the app itself uses generate_all(),
+    which returns in-memory PNGs. Remove the file with cleanup_temp_files().
+
+    Args:
+        orientation (float): Direction in degrees (0-360, 0/360=North).
+        size (tuple): Size of the output image (width, height).
+
+    Returns:
+        str: Path to the generated compass image (temporary file) or None if failed.
+    """
+    global _temp_files_this_run
+
+    orientation = _valid_orientation(orientation)
+    if orientation is None:
+        return None
+
+    img = _render_compass(orientation, size)
+    if img is None:
+        return None
+
+    temp_img_path = None # Initialize path
+    try:
         # --- Save to Temporary File ---
         temp_fd, temp_img_path = tempfile.mkstemp(suffix='.png')
-        os.close(temp_fd)
-        img.save(temp_img_path, 'PNG')
+        with os.fdopen(temp_fd, 'wb') as f:
+            img.save(f, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
 
         # Keep track for cleanup
         _temp_files_this_run.append(temp_img_path)
@@ -328,7 +808,7 @@ def generate_compass_indicator(orientation, size=(100, 100)):
         return temp_img_path
 
     except Exception as e:
-        print(f"ERROR generating compass indicator for {orientation}°: {str(e)}")
+        print(f"ERROR saving compass indicator for {orientation}°: {str(e)}")
         # Attempt cleanup if file was created
         if temp_img_path and os.path.exists(temp_img_path):
              try:
@@ -340,6 +820,170 @@ def generate_compass_indicator(orientation, size=(100, 100)):
         return None
 
 
+def generate_compass_bytes(orientation, size=(100, 100)):
+    """
+    Generate a compass direction indicator as an in-memory PNG.
+
+    Same as generate_compass_indicator(), but without the temp file round-trip.
+
+    Returns:
+        io.BytesIO: PNG data positioned at the start, or None if failed.
+    """
+    orientation = _valid_orientation(orientation)
+    if orientation is None:
+        return None
+    img = _render_compass(orientation, size)
+    return _png_stream(img) if img is not None else None
+
+
+def _png_stream(image):
+    """Encode an image as PNG into a BytesIO, rewound for reading."""
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
+    buffer.seek(0)
+    return buffer
+
+
+def _tile_urls(latitude, longitude, zoom, size):
+    """
+    Return the tile URLs needed for a map centred on the given point.
+
+    Mirrors the tile range StaticMap.render() requests for a single centred marker.
+    """
+    width, height = size
+    x_center = _lon_to_x(longitude, zoom)
+    y_center = _lat_to_y(latitude, zoom)
+    x_min = int(math.floor(x_center - (0.5 * width / TILE_SIZE)))
+    y_min = int(math.floor(y_center - (0.5 * height / TILE_SIZE)))
+    x_max = int(math.ceil(x_center + (0.5 * width / TILE_SIZE)))
+    y_max = int(math.ceil(y_center + (0.5 * height / TILE_SIZE)))
+
+    max_tile = 2 ** zoom
+    return [
+        OSM_TILE_URL.format(z=zoom, x=(x + max_tile) % max_tile, y=(y + max_tile) % max_tile)
+        for x in range(x_min, x_max)
+        for y in range(y_min, y_max)
+    ]
+
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header (delay in seconds or an HTTP date). Returns None if absent or invalid."""
+    retry_after = response.headers.get('Retry-After', '').strip()
+    if not retry_after:
+        return None
+    if retry_after.isdigit():
+        return int(retry_after)
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _retry_delay(attempt, response=None):
+    """Seconds to wait before retry number `attempt`: the server's Retry-After, else exponential backoff with jitter."""
+    if response is not None:
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, 60) + random.random()
+    return 2 ** attempt + random.random()
+
+
+def _download_tile(url, headers=None, timeout=None, max_attempts=TILE_MAX_RETRIES):
+    """
+    Download a tile, retrying transient failures with backoff, and store it in the tile cache.
+
+    Returns:
+        tuple: (status_code, content). status_code is None if no response was received.
+    """
+    global _tile_backoff_until
+    headers = headers or OSM_HEADERS
+    timeout = timeout or TILE_REQUEST_TIMEOUT
+    status_code, content = None, None
+    for attempt in range(max_attempts):
+        response = None
+        try:
+            with _tile_request_slots:
+                # Honour a backoff another thread was told about
+                wait = _tile_backoff_until - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                response = _TILE_SESSION.get(url, headers=headers, timeout=timeout)
+            status_code, content = response.status_code, response.content
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"    Warning: Tile request failed for {url}: {type(e).__name__}")
+            status_code, content = None, None
+        except requests.RequestException as e:
+            print(f"    Warning: Tile request failed for {url}: {e}")
+            return None, None
+
+        if status_code == 200:
+            _write_cached_tile(url, content)
+            return status_code, content
+        if status_code is not None and status_code not in _TRANSIENT_STATUS_CODES:
+            break # Permanent failure, retrying won't help
+        delay = _retry_delay(attempt, response)
+        if status_code in (429, 503):
+            # Server-side rate limit: hold off all tile requests, not just this one
+            _tile_backoff_until = max(_tile_backoff_until, time.time() + delay)
+        if attempt + 1 < max_attempts:
+            time.sleep(delay)
+
+    if status_code is not None:
+        print(f"    Warning: Tile request failed [{status_code}]: {url}")
+    return status_code, content
+
+
+def _fetch_tile(url):
+    """Download one tile into the tile cache. Returns True on success."""
+    status_code, _ = _download_tile(url)
+    return status_code == 200
+
+
+def prefetch_tiles(points, zoom=15, size=(180, 180)):
+    """
+    Download every tile needed by a batch of maps in one pass.
+
+    Photos from the same site share most of their tiles; collecting the union
+    first means each tile is requested once per run instead of once per photo.
+    Renders then read the tiles from the on-disk cache.
+
+    Args:
+        points (list): List of (latitude, longitude) tuples.
+        zoom (int): Zoom level for the maps.
+        size (tuple): Size of the map images (width, height) in pixels.
+
+    Returns:
+        int: Number of tiles downloaded.
+    """
+    if not STATICMAP_AVAILABLE:
+        return 0
+
+    # Key first so photos taken at the same spot collapse to one map
+    map_keys = {_map_key(lat, lon, zoom) for lat, lon in points} - {None}
+    tile_urls = set()
+    for map_key in map_keys:
+        tile_urls.update(_tile_urls(*_map_key_coords(map_key), zoom, size))
+    missing_urls = [url for url in tile_urls if not _is_tile_cached(url)]
+    if not missing_urls:
+        return 0
+
+    print(f"Prefetching {len(missing_urls)} map tile(s) for {len(map_keys)} location(s)...")
+    # Same concurrency StaticMap uses for a single map
+    with ThreadPoolExecutor(4) as pool:
+        downloaded = sum(pool.map(_fetch_tile, missing_urls))
+    print(f"Prefetched {downloaded} of {len(missing_urls)} map tile(s).")
+    return downloaded
+
+
+def _batch_cache_paths(points, zoom, size):
+    """Return the tile and map cache files needed to render maps for a batch of (latitude, longitude) points."""
+    paths = []
+    for map_key in {_map_key(lat, lon, zoom) for lat, lon in points} - {None}:
+        paths.append(_map_cache_path(map_key, size))
+        paths.extend(_tile_cache_path(url) for url in _tile_urls(*_map_key_coords(map_key), zoom, size))
+    return paths
+
+
 def cleanup_temp_files(file_paths=None):
     """
     Clean up temporary map/compass files created by this module during the current run.
@@ -360,16 +1004,81 @@ def cleanup_temp_files(file_paths=None):
     print(f"Cleaning up {len(paths_to_clean)} temporary map/compass file(s)...")
     cleaned_count = 0
     for path in paths_to_clean:
-        if path and os.path.exists(path):
-            try:
-                os.unlink(path)
-                # print(f"  - Cleaned: {path}") # Reduced verbosity
-                cleaned_count += 1
-            except Exception as e:
-                print(f"ERROR: Failed to remove temp file '{path}': {str(e)}")
+        # Unlink directly rather than stat first; a missing file is already clean
+        try:
+            os.unlink(path)
+            # print(f"  - Cleaned: {path}") # Reduced verbosity
+            cleaned_count += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"ERROR: Failed to remove temp file '{path}': {str(e)}")
 
     if cleaned_count > 0:
          print(f"Successfully cleaned {cleaned_count} map/compass temporary file(s).")
 
     # Reset the list for the next potential run within the same app instance
     _temp_files_this_run = []
+
+
+def generate_all(tasks, zoom=15, map_size=(180, 180), compass_size=(100, 100), max_workers=None):
+    """
+    Submit map and compass generation for a batch of photos to a worker thread pool.
+
+    Each photo's map and compass are independent jobs, so they run concurrently instead
+    of serially in the caller. Threads rather than processes: the work is tile I/O plus
+    Pillow operations that release the GIL, and threads share the font, compass and
+    tile caches and the tile request limit instead of each worker rebuilding its own.
+    Photos whose coordinates fall on the same map pixel at this zoom (same _map_key():
+    zoom, pixel x, pixel y) share a single map render, and photos with the same heading
+    (to the degree) share a compass.
+
+    Args:
+        tasks (list): List of (latitude, longitude, orientation) tuples, one per photo.
+                      Any value may be None if the photo lacks that data.
+        zoom (int): Zoom level for the maps.
+        map_size (tuple): Size of the map images (width, height) in pixels.
+        compass_size (tuple): Size of the compass images (width, height) in pixels.
+        max_workers (int): Number of worker threads (default: ThreadPoolExecutor's).
+
+    Returns:
+        list: One (map_future, compass_future) pair per task. A future is None when the
+              task has no valid data for that image. Each future resolves to an in-memory PNG
+              (io.BytesIO) or None; no temp files are written.
+    """
+    futures = []
+    if not tasks:
+        return futures
+
+    # One batched tile download up front instead of per-photo requests in each worker
+    points = [(lat, lon) for lat, lon, _ in tasks]
+    prefetch_tiles(points, zoom, map_size)
+    # Keep the tile and map caches in bounds, once per batch, without evicting what it needs
+    _prune_cache(keep_paths=_batch_cache_paths(points, zoom, map_size))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    map_futures = {} # Map key (see _map_key()) -> future, to dedupe repeat locations
+    compass_futures = {} # Rounded orientation -> future, likewise for repeat headings
+    try:
+        for latitude, longitude, orientation in tasks:
+            map_future = None
+            compass_future = None
+            if latitude is not None and longitude is not None:
+                map_key = _map_key(latitude, longitude, zoom) or (latitude, longitude)
+                map_future = map_futures.get(map_key)
+                if map_future is None:
+                    map_future = executor.submit(generate_map_bytes, latitude, longitude, zoom, map_size)
+                    map_futures[map_key] = map_future
+            # Validated before keying: round() raises on NaN/inf headings
+            compass_key = _valid_orientation(orientation)
+            if compass_key is not None:
+                compass_future = compass_futures.get(compass_key)
+                if compass_future is None:
+                    compass_future = executor.submit(generate_compass_bytes, compass_key, compass_size)
+                    compass_futures[compass_key] = compass_future
+            futures.append((map_future, compass_future))
+    finally:
+        # Don't block here; already-submitted work keeps running and the
+        # workers exit once the queue drains.
+        executor.shutdown(wait=False)
+    return futures
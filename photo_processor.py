@@ -3,6 +3,13 @@ Photo Appendix Generator - Photo Processing Module
 This module handles reading photos and extracting metadata.
 """
 import os
+import io
+import builtins
+import itertools
+import contextlib
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import exifread
 from PIL import Image, ExifTags # Import ExifTags for orientation handling
 import re
@@ -10,10 +17,20 @@ import tempfile
 import shutil
 import subprocess
 import json
+import plistlib
 from datetime import datetime
 from fractions import Fraction
 import warnings
 
+# Photos are processed on worker threads (see extract_metadata_from_photos()).
+# A bare print() writes the text and the newline separately, so lines from
+# different photos can splice together; every print in this module holds
+# this lock, which keeps each line (or block, if printed in one call) whole.
+_print_lock = threading.Lock()
+
+def print(*args, **kwargs):
+    with _print_lock: builtins.print(*args, **kwargs)
+
 # Suppress specific warnings from exifread if they become noisy
 warnings.filterwarnings("ignore", category=UserWarning, module='exifread')
 
@@ -27,55 +44,256 @@ except ImportError:
     HEIC_SUPPORT = False
     print("Warning: pillow-heif not installed. HEIC support may be limited or require conversion.")
 
+# Use orjson to parse ExifTool's JSON output if available (faster C parser).
+# Its JSONDecodeError subclasses json's, so error handling is the same either way.
+try:
+    import orjson
+    _json_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _json_loads = json.loads
+    ORJSON_AVAILABLE = False
+
+# Patterns used per photo, compiled once
+_AAE_ADJUSTMENT_DESCRIPTION_RE = re.compile(r'<key>adjustmentDescription</key>\s*<string>([^<]+)</string>')
+_AAE_DESCRIPTION_RE = re.compile(r'<string name="description">([^<]+)</string>')
+_GPS_NON_NUMERIC_RE = re.compile(r'[^\d\.\s-]')
+_LEADING_NUMBER_RE = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)")
+# Fallback captions: camera filename prefixes, separators and embedded timestamps
+_FILENAME_PREFIX_RE = re.compile(r'^(IMG|DSC|VID|PXL|Screenshot|Screen Shot)[\s_-]*', re.IGNORECASE)
+_FILENAME_SEPARATORS_RE = re.compile(r'[_ -]+')
+_FILENAME_DATETIME_RE = re.compile(r'(\d{4})(\d{2})(\d{2})[\s_-]*(\d{2})(\d{2})(\d{2})')
+
 # --- ExifTool Functions ---
 def find_exiftool():
     """Tries to find the ExifTool executable."""
-    if os.name == 'nt': check_cmds = [['where', 'exiftool.exe'], ['where', 'exiftool']]
-    else: check_cmds = [['which', 'exiftool']]
-    for cmd in check_cmds:
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False, encoding='utf-8')
-            if result.returncode == 0 and result.stdout:
-                path = result.stdout.strip().split('\n')[0]
-                if os.path.exists(path):
-                     print(f"Found ExifTool at: {path}")
-                     return path
-        except FileNotFoundError: continue
-        except Exception as e: print(f"Error checking for ExifTool with '{' '.join(cmd)}': {e}")
+    # shutil.which searches PATH in-process, instead of spawning 'which'/'where' on every start
+    names = ['exiftool.exe', 'exiftool'] if os.name == 'nt' else ['exiftool']
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            print(f"Found ExifTool at: {path}")
+            return path
     print("Warning: ExifTool not found in standard locations or PATH.")
     return None
 
 EXIFTOOL_PATH = find_exiftool()
+# -fast2: don't scan past the metadata for trailers, or decode maker notes.
+# None of the tags read below come from either.
+EXIFTOOL_ARGS = ['-fast2', '-j', '-n', '-a', '-G1']
+
+def _clean_exiftool_metadata(metadata):
+    """Drop empty/null values from one file's ExifTool metadata."""
+    return {k: v for k, v in metadata.items() if not (isinstance(v, str) and v.lower() in ('null', '', 'none'))}
+
+def _parse_exiftool_json(output, photo_path):
+    """Parse ExifTool's -j output for one file into a dict, dropping empty/null values."""
+    try:
+        metadata_list = _json_loads(output)
+        if metadata_list and isinstance(metadata_list, list) and len(metadata_list) > 0:
+            return _clean_exiftool_metadata(metadata_list[0])
+        return {}
+    except ValueError as json_err: # JSONDecodeError, or UnicodeDecodeError for undecodable bytes
+        print(f"Error parsing ExifTool JSON for {os.path.basename(photo_path)}: {json_err}")
+        return {}
+
+def _exiftool_path_key(path):
+    """Normalize a path for matching ExifTool's SourceFile (which uses '/' on Windows too)."""
+    return os.path.normcase(os.path.normpath(path))
 
 def get_metadata_with_exiftool(photo_path):
     """Use ExifTool to extract metadata."""
     global EXIFTOOL_PATH
     if not EXIFTOOL_PATH: return {}
     try:
-        cmd = [EXIFTOOL_PATH, '-j', '-n', '-a', '-G1', photo_path]
-        try: result = subprocess.run(cmd, capture_output=True, text=True, check=False, encoding='utf-8', errors='replace')
-        except UnicodeDecodeError:
-             print("ExifTool output decode error (UTF-8), trying default encoding...")
-             result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        if result.returncode != 0 and result.stderr and ("Warning:" not in result.stderr or "Error:" in result.stderr):
-            print(f"ExifTool potential error (RC: {result.returncode}): {result.stderr.strip()}")
-        if result.stdout:
-            try:
-                metadata_list = json.loads(result.stdout)
-                if metadata_list and isinstance(metadata_list, list) and len(metadata_list) > 0:
-                    cleaned_metadata = {k: v for k, v in metadata_list[0].items() if not (isinstance(v, str) and v.lower() in ('null', '', 'none'))}
-                    return cleaned_metadata
-                return {}
-            except json.JSONDecodeError as json_err:
-                print(f"Error parsing ExifTool JSON for {os.path.basename(photo_path)}: {json_err}")
-                return {}
+        cmd = [EXIFTOOL_PATH] + EXIFTOOL_ARGS + [photo_path]
+        # stdout is left as bytes: ExifTool's JSON is UTF-8 and both json and orjson parse bytes directly
+        result = subprocess.run(cmd, capture_output=True, check=False)
+        stderr = result.stderr.decode('utf-8', errors='replace')
+        if result.returncode != 0 and stderr and ("Warning:" not in stderr or "Error:" in stderr):
+            print(f"ExifTool potential error (RC: {result.returncode}): {stderr.strip()}")
+        if result.stdout: return _parse_exiftool_json(result.stdout, photo_path)
         else: return {}
     except FileNotFoundError:
          print(f"Error: ExifTool command ('{EXIFTOOL_PATH}') not found during execution."); EXIFTOOL_PATH = None; return {}
     except Exception as e: print(f"Error running ExifTool for {os.path.basename(photo_path)}: {str(e)}"); return {}
 
+class ExifToolProcess:
+    """
+    One long-running ExifTool process ('-stay_open') shared by a batch of photos.
+
+    Starting ExifTool means starting Perl, which costs far more than reading a
+    photo's tags, so a batch pays it once instead of once per photo. Use as a
+    context manager. If the process can't be started or dies, get_metadata()
+    falls back to a one-off get_metadata_with_exiftool() call.
+    """
+    def __init__(self, exiftool_path=None):
+        self.exiftool_path = exiftool_path or EXIFTOOL_PATH
+        self.process = None
+        self._execute_ids = itertools.count(1)
+        self._lock = threading.Lock() # One command at a time on the pipes
+        self._stderr_lines = None # Filled by a reader thread; see _drain_stderr()
+
+    def __enter__(self):
+        self.start(); return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Launch ExifTool, reading its arguments from stdin."""
+        if not self.exiftool_path: return
+        try:
+            self.process = subprocess.Popen([self.exiftool_path, '-stay_open', 'True', '-@', '-'],
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            text=True, encoding='utf-8', errors='replace')
+        except Exception as e: print(f"Error starting ExifTool process: {e}"); self.process = None; return
+        # stderr is drained as it arrives: _execute() reads all of stdout first, and if
+        # ExifTool filled the stderr pipe meanwhile (one error per bad file) both would block
+        self._stderr_lines = queue.Queue()
+        threading.Thread(target=self._drain_stderr, args=(self.process.stderr, self._stderr_lines), daemon=True).start()
+
+    @staticmethod
+    def _drain_stderr(stream, lines):
+        """Move stderr lines into a queue until ExifTool exits; None marks the end."""
+        try:
+            for line in stream: lines.put(line)
+        finally: lines.put(None)
+
+    def close(self):
+        """Ask ExifTool to exit, killing it if it doesn't."""
+        if self.process is None: return
+        try:
+            self.process.stdin.write('-stay_open\nFalse\n'); self.process.stdin.flush()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill(); self.process.wait()
+        self.process = None
+
+    def _read_until(self, stream, marker):
+        """Read lines from stream (any line iterable) up to marker; returns the text before it."""
+        lines = []
+        for line in stream:
+            if line.rstrip('\r\n') == marker: return ''.join(lines)
+            lines.append(line)
+        raise EOFError("ExifTool exited unexpectedly")
+
+    def _execute(self, photo_paths):
+        """Run one ExifTool command over photo_paths; returns its stdout, or None if the process failed."""
+        with self._lock:
+            if self.process is None: return None
+            execute_id = next(self._execute_ids); ready = f"{{ready{execute_id}}}"
+            # Filenames are sent as UTF-8; ExifTool needs telling on Windows
+            args = ['-charset', 'filename=utf8'] + EXIFTOOL_ARGS + list(photo_paths) + ['-echo4', ready, f'-execute{execute_id}']
+            try:
+                self.process.stdin.write('\n'.join(args) + '\n'); self.process.stdin.flush()
+                output = self._read_until(self.process.stdout, ready)
+                errors = self._read_until(iter(self._stderr_lines.get, None), ready)
+            except Exception as e:
+                print(f"Error talking to ExifTool process ({e}); falling back to one call per photo.")
+                self.close(); return None
+        if "Error:" in errors: print(f"ExifTool potential error: {errors.strip()}")
+        return output
+
+    def get_metadata(self, photo_path):
+        """Like get_metadata_with_exiftool(), but served by the running process."""
+        if self.process is None: return get_metadata_with_exiftool(photo_path)
+        output = self._execute([photo_path])
+        if output is None: return get_metadata_with_exiftool(photo_path)
+        return _parse_exiftool_json(output, photo_path) if output.strip() else {}
+
+    def get_metadata_batch(self, photo_paths):
+        """
+        Read metadata for many photos in a single ExifTool command.
+
+        Returns:
+            dict: photo path -> metadata dict. Photos ExifTool couldn't read are
+                  left out, so callers can fall back to get_metadata().
+        """
+        if self.process is None or not photo_paths: return {}
+        output = self._execute(photo_paths)
+        if not output or not output.strip(): return {}
+        try: metadata_list = _json_loads(output)
+        except json.JSONDecodeError as json_err: print(f"Error parsing batched ExifTool JSON: {json_err}"); return {}
+        by_source = {_exiftool_path_key(m['SourceFile']): m for m in metadata_list if isinstance(m, dict) and 'SourceFile' in m}
+        batch = {}
+        for photo_path in photo_paths:
+            metadata = by_source.get(_exiftool_path_key(photo_path))
+            if metadata is not None: batch[photo_path] = _clean_exiftool_metadata(metadata)
+        return batch
+
+# --- Metadata Cache ---
+# Extracted metadata persists across runs, so re-running on the same photos
+# skips ExifTool/mdls/exifread entirely. An entry is only used while the
+# photo and its .AAE sidecar keep the size and modification time it was
+# extracted from.
+METADATA_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'photo_appendix', 'metadata.json')
+_METADATA_CACHE_VERSION = 2 # Bump when extraction changes, to drop old entries
+_CACHED_FIELDS = ('caption', 'latitude', 'longitude', 'orientation', 'width', 'height')
+_metadata_cache = None # abs path -> {'signature': ..., 'metadata': ...}; loaded lazily
+_metadata_cache_dirty = False
+_metadata_cache_lock = threading.Lock()
+
+def _stat_or_none(photo_path):
+    """os.stat() result for a file, or None if it can't be stat'ed."""
+    try: return os.stat(photo_path)
+    except OSError: return None
+
+def _file_signature(photo_path, st=None):
+    """[size, mtime_ns, AAE [size, mtime_ns] or None] for a photo, or None if it can't be stat'ed. Pass st to reuse a stat already taken."""
+    if st is None: st = _stat_or_none(photo_path)
+    if st is None: return None
+    try: aae_st = os.stat(os.path.splitext(photo_path)[0] + '.AAE'); aae_signature = [aae_st.st_size, aae_st.st_mtime_ns]
+    except OSError: aae_signature = None
+    return [st.st_size, st.st_mtime_ns, aae_signature]
+
+def _load_metadata_cache():
+    """Return the metadata cache dict, reading it from disk on first use."""
+    global _metadata_cache
+    with _metadata_cache_lock:
+        if _metadata_cache is None:
+            try:
+                with open(METADATA_CACHE_PATH, 'rb') as f: data = _json_loads(f.read())
+                _metadata_cache = data.get('entries', {}) if data.get('version') == _METADATA_CACHE_VERSION else {}
+            except (OSError, ValueError, AttributeError): _metadata_cache = {}
+        return _metadata_cache
+
+def get_cached_metadata(photo_path, st=None):
+    """Return the cached metadata fields for an unchanged photo, or None. st: the photo's os.stat(), if already taken."""
+    entry = _load_metadata_cache().get(os.path.abspath(photo_path))
+    if entry is None: return None
+    signature = _file_signature(photo_path, st)
+    if signature is None or entry.get('signature') != signature: return None
+    return entry.get('metadata')
+
+def _store_cached_metadata(photo_path, photo_data, st=None):
+    """Remember a photo's extracted metadata fields. st: the photo's os.stat() from before extraction, if taken."""
+    global _metadata_cache_dirty
+    signature = _file_signature(photo_path, st)
+    if signature is None: return
+    cache = _load_metadata_cache()
+    with _metadata_cache_lock:
+        cache[os.path.abspath(photo_path)] = {'signature': signature, 'metadata': {field: photo_data[field] for field in _CACHED_FIELDS}}
+        _metadata_cache_dirty = True
+
+def save_metadata_cache():
+    """Write the metadata cache to disk if it changed. Written atomically."""
+    global _metadata_cache_dirty
+    with _metadata_cache_lock:
+        if not _metadata_cache_dirty: return
+        try:
+            os.makedirs(os.path.dirname(METADATA_CACHE_PATH), exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(METADATA_CACHE_PATH), suffix='.part')
+            with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': _METADATA_CACHE_VERSION, 'entries': _metadata_cache}, f)
+            os.replace(temp_path, METADATA_CACHE_PATH)
+            _metadata_cache_dirty = False
+        except OSError as e: print(f"Warning: Could not save metadata cache '{METADATA_CACHE_PATH}': {e}")
+
 # --- Metadata Extraction Logic ---
 
+VERBOSE_CAPTION_LOG = False # Print every caption field checked, not just the one selected
+
       
 def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=None, aae_data=None):
     """
@@ -86,7 +304,7 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
 
     # --- Priority 1: ExifTool ---
     if exiftool_metadata:
-        print(f"    Checking ExifTool metadata...")
+        if VERBOSE_CAPTION_LOG: print(f"    Checking ExifTool metadata...")
         # ***** FIX: Added 'IFD0:ImageDescription' to the primary list *****
         # These are most likely to hold the user-entered description
         primary_description_fields = [
@@ -98,12 +316,15 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
             'QuickTime:Description', # Sometimes used in HEIC containers
             'QuickTime:Title'        # Sometimes Title is used for description
         ]
+        # Case-insensitive lookup, just in case ExifTool's JSON output differs slightly sometimes.
+        # Built once, instead of lowercasing every key again for each field checked.
+        keys_by_lower = {k.lower(): k for k in exiftool_metadata}
         # Check these primary fields
         for field in primary_description_fields:
-            # Case-insensitive check just in case ExifTool's JSON output differs slightly sometimes
-            if field.lower() in map(str.lower, exiftool_metadata.keys()) and isinstance(exiftool_metadata[field], str):
-                 value = exiftool_metadata[field].strip()
-                 print(f"      Checking ExifTool Primary Field '{field}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+            found_key = keys_by_lower.get(field.lower())
+            if found_key and isinstance(exiftool_metadata[found_key], str):
+                 value = exiftool_metadata[found_key].strip()
+                 if VERBOSE_CAPTION_LOG: print(f"      Checking ExifTool Primary Field '{field}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
                  if value:
                      caption = value
                      print(f"      >> SELECTED Caption from ExifTool '{field}'")
@@ -115,7 +336,7 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
 
         # If no primary description found, check other related fields (Title, Comment etc.)
         if caption is None:
-            print(f"    Primary description fields not found or empty. Checking secondary fields...")
+            if VERBOSE_CAPTION_LOG: print(f"    Primary description fields not found or empty. Checking secondary fields...")
             secondary_related_fields = [
                 'XMP:Title',             # Title might be used
                 'IPTC:ObjectName',       # IPTC standard title/name
@@ -127,18 +348,17 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
             ]
             for field in secondary_related_fields:
                  # Case-insensitive check
-                 field_lower = field.lower()
-                 found_key = next((k for k in exiftool_metadata if k.lower() == field_lower), None)
+                 found_key = keys_by_lower.get(field.lower())
 
                  if found_key and isinstance(exiftool_metadata[found_key], str):
                     value = exiftool_metadata[found_key].strip()
-                    print(f"      Checking ExifTool Secondary Field '{found_key}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+                    if VERBOSE_CAPTION_LOG: print(f"      Checking ExifTool Secondary Field '{found_key}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
                     # Special handling for UserComment encoding prefixes
                     if found_key.upper() == 'EXIF:USERCOMMENT' and '\x00' in value:
                         parts = value.split('\x00')
                         potential_caption = parts[-1].strip()
                         value = potential_caption if potential_caption else (parts[-2].strip() if len(parts) > 1 else "")
-                        print(f"        (UserComment processed value: '{value[:60]}{'...' if len(value)>60 else ''}')")
+                        if VERBOSE_CAPTION_LOG: print(f"        (UserComment processed value: '{value[:60]}{'...' if len(value)>60 else ''}')")
 
                     if value:
                         caption = value
@@ -147,13 +367,13 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
 
     # --- Priority 2: macOS mdls ---
     if mdls_metadata and caption is None:
-        print(f"    ExifTool found no caption. Checking mdls metadata...")
+        if VERBOSE_CAPTION_LOG: print(f"    ExifTool found no caption. Checking mdls metadata...")
         # Prioritize description field in mdls as well
         mdls_fields_priority = ['kMDItemDescription', 'kMDItemTitle', 'kMDItemHeadline', 'kMDItemSubject', 'kMDItemComment']
         for field in mdls_fields_priority:
              if field in mdls_metadata and mdls_metadata[field] and mdls_metadata[field] != "(null)":
                   value = mdls_metadata[field].strip()
-                  print(f"      Checking mdls Field '{field}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+                  if VERBOSE_CAPTION_LOG: print(f"      Checking mdls Field '{field}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
                   if value:
                       caption = value
                       print(f"      >> SELECTED Caption from mdls '{field}'")
@@ -161,13 +381,13 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
 
     # --- Priority 3: exifread Tags ---
     if tags and caption is None:
-        print(f"    ExifTool/mdls found no caption. Checking exifread tags...")
+        if VERBOSE_CAPTION_LOG: print(f"    ExifTool/mdls found no caption. Checking exifread tags...")
         # Only check the most direct description tag from exifread's perspective
         tag_name = 'Image ImageDescription'
         if tag_name in tags:
              try:
                  value = str(tags[tag_name]).strip()
-                 print(f"      Checking exifread Field '{tag_name}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+                 if VERBOSE_CAPTION_LOG: print(f"      Checking exifread Field '{tag_name}': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
                  if '\x00' in value: # Clean potential encoding markers/nulls
                      value = value.split('\x00')[-1].strip()
                  if value:
@@ -180,19 +400,19 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
 
     # --- Priority 4: Check AAE Sidecar ---
     if aae_data and caption is None:
-        print("    ExifTool/mdls/exifread found no caption. Checking AAE sidecar...")
-        match_adj = re.search(r'<key>adjustmentDescription</key>\s*<string>([^<]+)</string>', aae_data)
+        if VERBOSE_CAPTION_LOG: print("    ExifTool/mdls/exifread found no caption. Checking AAE sidecar...")
+        match_adj = _AAE_ADJUSTMENT_DESCRIPTION_RE.search(aae_data)
         if match_adj:
             value = match_adj.group(1).strip()
-            print(f"      Checking AAE 'adjustmentDescription': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+            if VERBOSE_CAPTION_LOG: print(f"      Checking AAE 'adjustmentDescription': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
             if value:
                 caption = value
                 print(f"      >> SELECTED Caption from AAE adjustmentDescription")
                 return caption
-        match_desc = re.search(r'<string name="description">([^<]+)</string>', aae_data)
+        match_desc = _AAE_DESCRIPTION_RE.search(aae_data)
         if match_desc: # Less likely for main description, but check as fallback
             value = match_desc.group(1).strip()
-            print(f"      Checking AAE 'description': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
+            if VERBOSE_CAPTION_LOG: print(f"      Checking AAE 'description': Found value '{value[:60]}{'...' if len(value)>60 else ''}'")
             if value:
                  caption = value
                  print(f"      >> SELECTED Caption from AAE description")
@@ -207,7 +427,6 @@ def extract_caption(filename, tags=None, exiftool_metadata=None, mdls_metadata=N
     
 
 
-# --- [ convert_gps_to_decimal, extract_gps_data, extract_orientation_data, get_macos_metadata, get_aae_data, apply_exif_orientation remain the same ] ---
 def convert_gps_to_decimal(gps_coords, gps_ref):
     """Converts GPS from deg/min/sec or string to decimal."""
     try:
@@ -223,7 +442,7 @@ def convert_gps_to_decimal(gps_coords, gps_ref):
         # Handle string format (attempt parsing)
         elif isinstance(gps_coords, str):
              # Clean string - remove deg, ', " symbols and extra whitespace
-            cleaned = re.sub(r'[^\d\.\s-]', '', gps_coords).strip()
+            cleaned = _GPS_NON_NUMERIC_RE.sub('', gps_coords).strip()
             parts = cleaned.split()
             if len(parts) == 3: # Assume deg min sec
                 degrees = float(parts[0])
@@ -306,7 +525,7 @@ def extract_orientation_data(tags=None, exiftool_metadata=None, mdls_metadata=No
             if field in exiftool_metadata and exiftool_metadata[field] is not None:
                 try:
                     value_str = str(exiftool_metadata[field])
-                    numeric_part = re.match(r"^[+-]?(\d+(\.\d*)?|\.\d+)", value_str)
+                    numeric_part = _LEADING_NUMBER_RE.match(value_str)
                     if numeric_part:
                         orientation = float(numeric_part.group(0))
                         if 0 <= orientation <= 360: return orientation
@@ -325,34 +544,39 @@ def extract_orientation_data(tags=None, exiftool_metadata=None, mdls_metadata=No
                 except (ValueError, TypeError, IndexError, AttributeError) as e: print(f"    Error parsing orientation from exifread tag '{tag_name}': {e}"); continue
     return None
 
+# Spotlight's mdls only exists on macOS; look it up once rather than per photo
+MDLS_PATH = shutil.which('mdls')
+
 def get_macos_metadata(photo_path):
     """Uses macOS 'mdls' command to get metadata."""
-    if not shutil.which('mdls'): return None
+    if not MDLS_PATH: return None
     try:
-        cmd = ['mdls', '-nullMarker', '(null)', photo_path]
-        result = subprocess.run(cmd, capture_output=True, check=False, text=True, encoding='utf-8')
+        keywords = ['kMDItemDescription', 'kMDItemTitle', 'kMDItemHeadline', 'kMDItemSubject',
+                    'kMDItemComment', 'kMDItemLatitude', 'kMDItemLongitude']
+        # Ask for just these attributes, in the same single call, rather than all ~100.
+        # '-plist -' prints them as a plist, so values need no unquoting and
+        # multi-line (array) values parse correctly; missing attributes are omitted.
+        cmd = [MDLS_PATH, '-plist', '-'] + [arg for key in keywords for arg in ('-name', key)] + [photo_path]
+        result = subprocess.run(cmd, capture_output=True, check=False)
         if result.returncode == 0 and result.stdout:
              mdls_data = {}
-             keywords = ['kMDItemDescription', 'kMDItemTitle', 'kMDItemHeadline', 'kMDItemSubject',
-                         'kMDItemComment', 'kMDItemLatitude', 'kMDItemLongitude']
-             for line in result.stdout.splitlines():
-                 parts = line.split(' = ', 1)
-                 if len(parts) == 2:
-                     key = parts[0].strip()
-                     if key in keywords:
-                         value = parts[1].strip().strip('"')
-                         if value != '(null)': mdls_data[key] = value
+             for key, value in plistlib.loads(result.stdout).items():
+                 if key not in keywords or value is None: continue
+                 if isinstance(value, list): value = ', '.join(str(v) for v in value)
+                 # Coordinates stay numeric; text attributes are read as strings
+                 mdls_data[key] = value if isinstance(value, (int, float)) else str(value)
              return mdls_data if mdls_data else None
-        else: print(f"Error running mdls (Return Code: {result.returncode}): {result.stderr}"); return None
+        else: print(f"Error running mdls (Return Code: {result.returncode}): {result.stderr.decode('utf-8', 'replace')}"); return None
     except Exception as e: print(f"Error getting macOS metadata via mdls: {str(e)}"); return None
 
 def get_aae_data(photo_path):
     """Reads content of .AAE sidecar file if it exists."""
     aae_path = os.path.splitext(photo_path)[0] + '.AAE'
-    if os.path.exists(aae_path):
-        try:
-            with open(aae_path, 'r', encoding='utf-8', errors='ignore') as f: return f.read()
-        except Exception as e: print(f"Error reading AAE file '{aae_path}': {str(e)}")
+    # Open directly; a missing sidecar fails the open, so no separate exists() stat
+    try:
+        with open(aae_path, 'r', encoding='utf-8', errors='ignore') as f: return f.read()
+    except FileNotFoundError: pass
+    except Exception as e: print(f"Error reading AAE file '{aae_path}': {str(e)}")
     return None
 
 def apply_exif_orientation(image):
@@ -372,93 +596,189 @@ def apply_exif_orientation(image):
     except (AttributeError, KeyError, IndexError, TypeError, SyntaxError) as e: print(f"Could not get or apply EXIF orientation: {e}"); return image
 
 
-def extract_metadata_from_photo(photo_path):
-    """Extract metadata from a single photo using multiple methods."""
+def oriented_size(image):
+    """
+    Return (width, height) as displayed after the EXIF Orientation tag is applied.
+
+    Reads only the tag, so unlike apply_exif_orientation() the pixels are
+    never decoded; orientations 5-8 are 90° turns and swap the dimensions.
+    """
+    width, height = image.size
+    try:
+        # 0x0112 is the Orientation tag; ExifTags.Base only exists from Pillow 9.3
+        if image.getexif().get(0x0112) in (5, 6, 7, 8): return height, width
+    except Exception as e: print(f"Could not read EXIF orientation: {e}")
+    return width, height
+
+def fallback_caption(filename):
+    """Caption from a photo's filename, e.g. 'Photo from 2024-05-01 14:30' for IMG_20240501_143000.jpg."""
+    filename_no_ext = os.path.splitext(filename)[0]
+    clean_name = _FILENAME_PREFIX_RE.sub('', filename_no_ext)
+    clean_name = _FILENAME_SEPARATORS_RE.sub(' ', clean_name).strip()
+    datetime_match = _FILENAME_DATETIME_RE.search(clean_name)
+    if datetime_match:
+         try:
+             dt_groups = datetime_match.groups()
+             dt_obj = datetime(int(dt_groups[0]), int(dt_groups[1]), int(dt_groups[2]), int(dt_groups[3]), int(dt_groups[4]), int(dt_groups[5]))
+             return f"Photo from {dt_obj.strftime('%Y-%m-%d %H:%M')}"
+         except ValueError: pass
+    return clean_name if clean_name else filename_no_ext
+
+def extract_metadata_from_photo(photo_path, exiftool=None, exiftool_metadata=None, file_stat=None, cached_metadata=None):
+    """
+    Extract metadata from a single photo using multiple methods.
+    Pass a running ExifToolProcess as exiftool to reuse it across photos, or
+    the photo's already fetched ExifTool metadata as exiftool_metadata, and
+    its os.stat() result as file_stat if the caller has already taken it.
+    A caller passing file_stat has also checked the cache: cached_metadata is
+    then its get_cached_metadata() result (None for a miss).
+    """
     print(f"\n--- Processing: {os.path.basename(photo_path)} ---")
     photo_data = { 'path': photo_path, 'filename': os.path.basename(photo_path), 'caption': None, 'latitude': None, 'longitude': None,
         'orientation': None, 'temp_file': None, 'width': None, 'height': None, 'error': None }
-    original_path = photo_path; processing_path = photo_path; is_heic = photo_path.lower().endswith('.heic'); temp_conversion_file = None
+    original_path = photo_path; is_heic = photo_path.lower().endswith('.heic')
+    # One stat up front: a missing or empty file can't yield any metadata, so
+    # skip ExifTool, mdls, exifread and the image open for it entirely
+    cache_checked = file_stat is not None
+    if file_stat is None:
+        try: file_stat = os.stat(photo_path)
+        except OSError as e: print(f"  ERROR: Cannot access '{photo_data['filename']}': {e}")
+    if file_stat is None or not file_stat.st_size:
+        photo_data['error'] = "File not found or unreadable" if file_stat is None else "File is empty"
+        photo_data['caption'] = fallback_caption(photo_data['filename'])
+        print(f"  Skipping metadata extraction ({photo_data['error']}). Using fallback caption: '{photo_data['caption']}'")
+        return photo_data
     try:
-        if is_heic:
+        if not cache_checked: cached_metadata = get_cached_metadata(original_path, file_stat)
+        if cached_metadata is not None:
+            print("  Using cached metadata (photo unchanged since it was last read).")
+            photo_data.update(cached_metadata)
+        if is_heic and photo_data['width'] is None: # Cached dimensions need no open
             if HEIC_SUPPORT:
-                print("  HEIC file detected. Attempting conversion to temporary JPG...")
+                # Only the header is read here. The pixels are decoded and converted
+                # to JPEG when the document embeds the photo (get_embeddable_image()).
+                print("  HEIC file detected. Reading dimensions...")
                 try:
                     with Image.open(photo_path) as img:
                          photo_data['width'], photo_data['height'] = img.size
-                         temp_fd, temp_path = tempfile.mkstemp(suffix='.jpg'); os.close(temp_fd)
-                         img.convert('RGB').save(temp_path, 'JPEG', quality=90)
-                         photo_data['temp_file'] = temp_path; temp_conversion_file = temp_path; processing_path = temp_path
-                         print(f"  Successfully converted HEIC to temporary JPG: {os.path.basename(temp_path)}")
                 except Exception as e:
-                    print(f"  ERROR: Failed to open or convert HEIC file '{os.path.basename(photo_path)}': {str(e)}")
-                    photo_data['error'] = f"HEIC processing failed: {e}"; processing_path = original_path
-            else: print("  HEIC file detected, but pillow-heif not installed."); processing_path = original_path
-        if photo_data['width'] is None and os.path.exists(processing_path):
+                    print(f"  ERROR: Failed to open HEIC file '{os.path.basename(photo_path)}': {str(e)}")
+                    photo_data['error'] = f"HEIC processing failed: {e}"
+            else: print("  HEIC file detected, but pillow-heif not installed.")
+        if photo_data['width'] is None:
             try:
-                with Image.open(processing_path) as img:
-                    img_oriented = apply_exif_orientation(img)
-                    photo_data['width'], photo_data['height'] = img_oriented.size
+                with Image.open(original_path) as img:
+                    photo_data['width'], photo_data['height'] = oriented_size(img)
                     print(f"  Image Dimensions (oriented): {photo_data['width']}x{photo_data['height']}")
             except Exception as e:
-                print(f"  ERROR: Could not open image '{os.path.basename(processing_path)}': {str(e)}")
+                print(f"  ERROR: Could not open image '{os.path.basename(original_path)}': {str(e)}")
                 if not photo_data['error']: photo_data['error'] = f"Image open failed: {e}"
-        exiftool_metadata = get_metadata_with_exiftool(original_path)
-        mdls_metadata = get_macos_metadata(original_path) if os.name == 'posix' else None
-        aae_data = get_aae_data(original_path)
-        exifread_tags = None
-        if os.path.exists(processing_path):
-            try:
-                with open(processing_path, 'rb') as f: exifread_tags = exifread.process_file(f, stop_tag='JPEGThumbnail', details=False)
-            except Exception as e: print(f"  Warning: Could not read tags using exifread from '{os.path.basename(processing_path)}': {str(e)}")
-
-        # ***** FIX: Pass filename to extract_caption *****
-        photo_data['caption'] = extract_caption(photo_data['filename'], exifread_tags, exiftool_metadata, mdls_metadata, aae_data)
-
-        photo_data['latitude'], photo_data['longitude'] = extract_gps_data(exifread_tags, exiftool_metadata, mdls_metadata, original_path)
-        photo_data['orientation'] = extract_orientation_data(exifread_tags, exiftool_metadata, mdls_metadata)
-        if photo_data['caption'] is None:
-            print("  No specific caption found. Generating fallback caption.")
-            filename_no_ext = os.path.splitext(photo_data['filename'])[0]
-            clean_name = re.sub(r'^(IMG|DSC|VID|PXL|Screenshot|Screen Shot)[\s_-]*', '', filename_no_ext, flags=re.IGNORECASE)
-            clean_name = re.sub(r'[_ -]+', ' ', clean_name).strip()
-            datetime_match = re.search(r'(\d{4})(\d{2})(\d{2})[\s_-]*(\d{2})(\d{2})(\d{2})', clean_name)
-            if datetime_match:
-                 try:
-                     dt_groups = datetime_match.groups()
-                     dt_obj = datetime(int(dt_groups[0]), int(dt_groups[1]), int(dt_groups[2]), int(dt_groups[3]), int(dt_groups[4]), int(dt_groups[5]))
-                     photo_data['caption'] = f"Photo from {dt_obj.strftime('%Y-%m-%d %H:%M')}"
-                 except ValueError: photo_data['caption'] = clean_name if clean_name else filename_no_ext
-            else: photo_data['caption'] = clean_name if clean_name else filename_no_ext
-            print(f"  Using fallback caption: '{photo_data['caption']}'")
+        if cached_metadata is None:
+            if exiftool_metadata is None:
+                exiftool_metadata = exiftool.get_metadata(original_path) if exiftool else get_metadata_with_exiftool(original_path)
+            # ExifTool is the first choice for every field and usually has them all,
+            # so the fallbacks below only run for fields it left empty. Each
+            # field keeps its source priority: ExifTool, then mdls, exifread, AAE.
+            # ***** FIX: Pass filename to extract_caption *****
+            photo_data['caption'] = extract_caption(photo_data['filename'], exiftool_metadata=exiftool_metadata)
+            photo_data['latitude'], photo_data['longitude'] = extract_gps_data(exiftool_metadata=exiftool_metadata, file_path=original_path)
+            photo_data['orientation'] = extract_orientation_data(exiftool_metadata=exiftool_metadata)
+            need_caption = photo_data['caption'] is None; need_gps = photo_data['latitude'] is None
+            if need_caption or need_gps or photo_data['orientation'] is None:
+                print("  Checking fallback metadata sources for missing fields...")
+                # mdls has captions and GPS but no heading; the AAE sidecar only captions
+                mdls_metadata = get_macos_metadata(original_path) if os.name == 'posix' and (need_caption or need_gps) else None
+                aae_data = get_aae_data(original_path) if need_caption else None
+                exifread_tags = None
+                try:
+                    # Only IFD0/EXIF/GPS tags are used: skip maker notes and the embedded thumbnail
+                    with open(original_path, 'rb') as f: exifread_tags = exifread.process_file(f, details=False, extract_thumbnail=False)
+                except Exception as e: print(f"  Warning: Could not read tags using exifread from '{os.path.basename(original_path)}': {str(e)}")
+                if need_caption:
+                    photo_data['caption'] = extract_caption(photo_data['filename'], exifread_tags, None, mdls_metadata, aae_data)
+                if need_gps:
+                    photo_data['latitude'], photo_data['longitude'] = extract_gps_data(exifread_tags, None, mdls_metadata, original_path)
+                if photo_data['orientation'] is None:
+                    photo_data['orientation'] = extract_orientation_data(exifread_tags, None, mdls_metadata)
+            if photo_data['caption'] is None:
+                print("  No specific caption found. Generating fallback caption.")
+                photo_data['caption'] = fallback_caption(photo_data['filename'])
+                print(f"  Using fallback caption: '{photo_data['caption']}'")
+            # Only cache what ExifTool read: a result from the fallbacks alone (ExifTool
+            # missing or failing) may lack fields and would otherwise stick until the photo changes
+            if not photo_data['error'] and exiftool_metadata: _store_cached_metadata(original_path, photo_data, file_stat)
     except Exception as e:
         print(f"  FATAL ERROR processing photo '{os.path.basename(photo_path)}': {str(e)}")
         photo_data['error'] = f"Fatal processing error: {e}"; import traceback; traceback.print_exc()
-    if temp_conversion_file: photo_data['temp_file'] = temp_conversion_file
-    print(f"--- Finished Processing: {photo_data['filename']} ---")
-    print(f"  Caption:     '{photo_data.get('caption', 'N/A')}'")
-    print(f"  GPS:         Lat={photo_data.get('latitude', 'N/A')}, Lon={photo_data.get('longitude', 'N/A')}")
-    print(f"  Orientation: {photo_data.get('orientation', 'N/A')}")
-    print(f"  Dimensions:  {photo_data.get('width', 'N/A')}x{photo_data.get('height', 'N/A')}")
-    print(f"  Error:       {photo_data.get('error', 'None')}")
+    # One print call, so the summary stays together when photos finish concurrently
+    print(f"--- Finished Processing: {photo_data['filename']} ---\n"
+          f"  Caption:     '{photo_data.get('caption', 'N/A')}'\n"
+          f"  GPS:         Lat={photo_data.get('latitude', 'N/A')}, Lon={photo_data.get('longitude', 'N/A')}\n"
+          f"  Orientation: {photo_data.get('orientation', 'N/A')}\n"
+          f"  Dimensions:  {photo_data.get('width', 'N/A')}x{photo_data.get('height', 'N/A')}\n"
+          f"  Error:       {photo_data.get('error', 'None')}")
     return photo_data
 
-def extract_metadata_from_photos(photo_paths):
-    """Extract metadata from multiple photos."""
-    photo_data_list = []
+def extract_metadata_from_photos(photo_paths, max_workers=None):
+    """
+    Extract metadata from multiple photos.
+
+    Photos are processed on a thread pool (max_workers threads, default
+    ThreadPoolExecutor's); the work is mostly file I/O, subprocesses and
+    HEIC decoding, which all release the GIL. Results keep the input order.
+    """
     total = len(photo_paths); print(f"\nStarting metadata extraction for {total} photos...")
-    for i, photo_path in enumerate(photo_paths):
-        photo_data = extract_metadata_from_photo(photo_path)
-        photo_data_list.append(photo_data)
+    # One stat per photo, shared by the batch filter, the cache check and extract_metadata_from_photo()
+    photo_stats = [_stat_or_none(photo_path) for photo_path in photo_paths]
+    # Missing and empty files are skipped per photo anyway (see extract_metadata_from_photo()),
+    # so they are neither looked up in the cache nor sent to ExifTool
+    cached = [get_cached_metadata(photo_path, st) if st is not None and st.st_size else None
+              for photo_path, st in zip(photo_paths, photo_stats)]
+    uncached_paths = [photo_path for photo_path, st, metadata in zip(photo_paths, photo_stats, cached)
+                      if st is not None and st.st_size and metadata is None]
+    # One ExifTool process for the whole batch, and one command for all photos. Not
+    # started at all when every photo is cached, so a re-run skips the Perl startup.
+    with ExifToolProcess() if EXIFTOOL_PATH and uncached_paths else contextlib.nullcontext() as exiftool:
+        batch_metadata = exiftool.get_metadata_batch(uncached_paths) if exiftool else {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            photo_data_list = list(executor.map(
+                lambda photo_path, st, metadata: extract_metadata_from_photo(photo_path, exiftool, batch_metadata.get(photo_path), st, metadata),
+                photo_paths, photo_stats, cached))
+    save_metadata_cache()
     print(f"\nFinished metadata extraction for {total} photos.")
     return photo_data_list
 
+def get_embeddable_image(photo_data):
+    """
+    Return the photo in a form python-docx can embed: its path, or for HEIC
+    (which Word can't show) a JPEG stream converted in memory.
+
+    Args:
+        photo_data (dict): A photo's metadata from extract_metadata_from_photo().
+
+    Returns:
+        str or io.BytesIO: Path to the image file, or the converted JPEG.
+    """
+    photo_path = photo_data.get('temp_file') or photo_data['path']
+    if not (HEIC_SUPPORT and photo_path.lower().endswith('.heic')): return photo_path
+    try:
+        with Image.open(photo_path) as img:
+            stream = io.BytesIO(); img.convert('RGB').save(stream, 'JPEG', quality=90)
+        stream.seek(0)
+        return stream
+    except Exception as e:
+        print(f"  ERROR: Failed to convert HEIC file '{os.path.basename(photo_path)}': {str(e)}")
+        return photo_path
+
 def cleanup_temp_files(photo_data_list):
     """Clean up temporary HEIC conversion files."""
     if not photo_data_list: return
     cleaned_count = 0
     for photo_data in photo_data_list:
         temp_file_path = photo_data.get('temp_file')
-        if temp_file_path and os.path.exists(temp_file_path):
-            try: os.unlink(temp_file_path); cleaned_count += 1
-            except Exception as e: print(f"ERROR: Failed to remove temp conversion file '{temp_file_path}': {str(e)}")
+        if not temp_file_path: continue
+        # Unlink directly rather than stat first; a missing file is already clean
+        try: os.unlink(temp_file_path); cleaned_count += 1
+        except FileNotFoundError: pass
+        except Exception as e: print(f"ERROR: Failed to remove temp conversion file '{temp_file_path}': {str(e)}")
     if cleaned_count > 0: print(f"Cleaned up {cleaned_count} temporary conversion files.")
\ No newline at end of file
@@ -3,6 +3,25 @@ Photo Appendix Generator - Utility Functions
 This module contains helper functions for the application.
 """
 import os
+import re
+
+IMAGE_FILE_RE = re.compile(r'\.(?:jpe?g|png|heic|tiff?|bmp|gif)$', re.IGNORECASE)
+
+def _scan_image_files(directory, image_files):
+    """Append image files under directory to image_files, files before subdirectories."""
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # is_dir() uses the d_type from the directory listing, so no stat per entry
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif IMAGE_FILE_RE.search(entry.name):
+                    image_files.append(entry.path)
+    except OSError:
+        return # Unreadable directories are skipped, as os.walk does
+    for subdir in subdirs:
+        _scan_image_files(subdir, image_files)
 
 def get_image_files(directory):
     """
@@ -14,7 +33,6 @@ def get_image_files(directory):
     Returns:
         list: List of image file paths.
     """
-    image_extensions = ['.jpg', '.jpeg', '.png', '.heic', '.tif', '.tiff', '.bmp', '.gif'] # Added more types
     image_files = []
 
     if not os.path.isdir(directory):
@@ -23,16 +41,7 @@ def get_image_files(directory):
 
     print(f"Scanning directory '{directory}' for image files...")
     try:
-        # Walk through the directory and subdirectories
-        for root, _, files in os.walk(directory):
-            for file in files:
-                # Check if the file has an image extension (case-insensitive)
-                file_lower = file.lower()
-                if any(file_lower.endswith(ext) for ext in image_extensions):
-                    # Construct full path and add to list
-                    full_path = os.path.join(root, file)
-                    image_files.append(full_path)
-
+        _scan_image_files(directory, image_files)
         print(f"Found {len(image_files)} image file(s).")
         return image_files
 